@@ -2,12 +2,17 @@
 # Implements the specification in compiler-spec.md
 # Generates imperative directives that the model will follow.
 
+import functools
+import heapq
 import re
 from collections import defaultdict
-from typing import List, Dict, Set
+from typing import List, Dict
 
 # ---------------------------------------------------------------------------
-# Patterns from spec (simplified)
+# Patterns from spec (simplified). Each category is fused into a single
+# compiled alternation with named groups so one re.search call per category
+# reports the matched type via lastgroup, instead of probing every pattern
+# individually.
 TRIGGER_PATTERNS = {
     r"\b(at start|conversation start|initially|first)\b": "conversation_start",
     r"\b(before responding|before output|before returning)\b": "pre_response",
@@ -21,14 +26,14 @@ TRIGGER_PATTERNS = {
 }
 
 ACTION_PATTERNS = {
-    r"\\b(load|fetch|retrieve|get|read)\\b": "retrieve",
-    r"\\b(search|query|find|look up|check)\\b": "search",
-    r"\\b(store|save|persist|write|remember)\\b": "store",
-    r"\\b(create|make|add|new)\\b": "create",
-    r"\\b(match|compare|check against|map to)\\b": "match",
-    r"\\b(discover|figure out|get out?|determine)\\b": "discover",
-    r"\\b(use tools|call|invoke|execute)\\b": "tool_call",
-    r"\\b(convert|transform|format|apply)\\b": "transform"
+    r"\b(load|fetch|retrieve|get|read)\b": "retrieve",
+    r"\b(search|query|find|look up|check)\b": "search",
+    r"\b(store|save|persist|write|remember)\b": "store",
+    r"\b(create|make|add|new)\b": "create",
+    r"\b(match|compare|check against|map to)\b": "match",
+    r"\b(discover|figure out|get out?|determine)\b": "discover",
+    r"\b(use tools|call|invoke|execute)\b": "tool_call",
+    r"\b(convert|transform|format|apply)\b": "transform"
 }
 
 CONDITION_PATTERNS = {
@@ -47,53 +52,75 @@ OBJECT_PATTERNS = {
     r"\bresult|answer|response|output\b": "result"
 }
 
+def _fuse_patterns(patterns: Dict[str, str]) -> "re.Pattern":
+    return re.compile("|".join(f"(?P<{typ}>{pat})" for pat, typ in patterns.items()),
+                      re.IGNORECASE)
+
+TRIGGER_RX = _fuse_patterns(TRIGGER_PATTERNS)
+ACTION_RX = _fuse_patterns(ACTION_PATTERNS)
+CONDITION_RX = _fuse_patterns(CONDITION_PATTERNS)
+OBJECT_RX = _fuse_patterns(OBJECT_PATTERNS)
+
 # ---------------------------------------------------------------------------
-def find_first_match(patterns: Dict[str, str], text: str) -> str:
-    for pat, typ in patterns.items():
-        if re.search(pat, text, re.IGNORECASE):
-            return typ
-    return ""
+def find_first_match(rx: "re.Pattern", text: str) -> str:
+    m = rx.search(text)
+    return m.lastgroup if m else ""
 
 def extract_components(instruction: str) -> Dict[str, str]:
     comp = {
-        "trigger": find_first_match(TRIGGER_PATTERNS, instruction),
-        "action":  find_first_match(ACTION_PATTERNS, instruction),
-        "condition": find_first_match(CONDITION_PATTERNS, instruction),
-        "object":   find_first_match(OBJECT_PATTERNS, instruction)
+        "trigger": find_first_match(TRIGGER_RX, instruction),
+        "action":  find_first_match(ACTION_RX, instruction),
+        "condition": find_first_match(CONDITION_RX, instruction),
+        "object":   find_first_match(OBJECT_RX, instruction)
     }
     if not comp["trigger"]:
         comp["trigger"] = "every_message"
     return comp
 
 # ---------------------------------------------------------------------------
+# Classification rules flattened into dispatch tables at import: one hash
+# lookup on (action, object), then on action alone, instead of a cascade of
+# list-membership tests per instruction.
+CLASSIFY_TABLE: Dict = {}
+for _a in ("retrieve", "search", "load", "get"):
+    CLASSIFY_TABLE[(_a, "memory")] = "LOOKUP"
+for _a in ("compare", "map"):
+    for _o in ("domain", "route"):
+        CLASSIFY_TABLE[(_a, _o)] = "MATCH"
+
+ACTION_ONLY = {
+    "match": "MATCH",
+    "discover": "DISCOVER",
+    "tool_call": "DISCOVER",
+    "store": "STORE",
+    "create": "STORE",
+    "transform": "APPLY"
+}
+
+TRIGGER_FALLBACK = {
+    "conversation_start": "LOOKUP",
+    "on_miss": "DISCOVER",
+    "on_success": "STORE",
+    "pre_response": "APPLY"
+}
+
 def classify_instruction(comp: Dict[str, str]) -> str:
     action = comp["action"]
-    obj = comp["object"]
-    trigger = comp["trigger"]
-    if action in ["retrieve", "search", "load", "get"] and obj == "memory":
-        return "LOOKUP"
-    if action == "match" or (action in ["compare", "map"] and obj in ["domain", "route"]):
-        return "MATCH"
-    if action in ["discover", "tool_call"]:
-        return "DISCOVER"
-    if action in ["store", "create"]:
-        return "STORE"
-    if action == "transform":
-        return "APPLY"
+    typ = CLASSIFY_TABLE.get((action, comp["object"])) or ACTION_ONLY.get(action)
+    if typ:
+        return typ
     if comp["condition"]:
         return "GATE"
     # fallback based on trigger
-    mapping = {
-        "conversation_start": "LOOKUP",
-        "on_miss": "DISCOVER",
-        "on_success": "STORE",
-        "pre_response": "APPLY"
-    }
-    return mapping.get(trigger, "UNKNOWN")
+    return TRIGGER_FALLBACK.get(comp["trigger"], "UNKNOWN")
 
 # ---------------------------------------------------------------------------
+# Map each delimiter to a newline so splitlines() does the scan in C,
+# avoiding the regex engine for a plain character-class split.
+_DELIMS = str.maketrans(";,.", "\n\n\n")
+
 def split_compound(text: str) -> List[str]:
-    parts = re.split(r"[;,.]\s*", text)
+    parts = text.translate(_DELIMS).splitlines()
     return [p.strip() for p in parts if p.strip()]
 
 TYPE_DEPENDENCIES = {
@@ -111,7 +138,10 @@ class BehavioralCompiler:
     def __init__(self, raw_text: str):
         self.raw_instructions = split_compound(raw_text)
         self.parsed: List[Dict] = []  # each dict holds id, original, components, type
-        self.graph: Dict[int, Set[int]] = defaultdict(set)
+        # indegree counts + successor lists are all Kahn needs; predecessor
+        # sets would only duplicate the edges at a per-set memory cost
+        self.indeg: Dict[int, int] = {}
+        self.successors: Dict[int, List[int]] = defaultdict(list)
         self.id_counter = 0
 
     def parse(self):
@@ -132,35 +162,38 @@ class BehavioralCompiler:
         type_to_ids = defaultdict(list)
         for e in self.parsed:
             type_to_ids[e["type"]].append(e["id"])
-        # explicit type dependencies (only earlier nodes considered)
+        # explicit type dependencies (only earlier nodes considered); each
+        # (cur, dep_id) pair occurs at most once since a node has one type
+        self.indeg = {e["id"]: 0 for e in self.parsed}
         for e in self.parsed:
             cur = e["id"]
             needed = TYPE_DEPENDENCIES.get(e["type"], [])
             for dep_type in needed:
                 for dep_id in type_to_ids.get(dep_type, []):
                     if dep_id < cur:
-                        self.graph[cur].add(dep_id)
-        # sequential order to keep original flow
-        for i in range(1, len(self.parsed)):
-            self.graph[i].add(i-1)
+                        self.indeg[cur] += 1
+                        self.successors[dep_id].append(cur)
+        # No blanket sequential edges: type dependencies constrain the order
+        # where it matters, and the (priority, original index) heap key keeps
+        # independent nodes stable relative to the input.
 
     def topological_sort(self) -> List[int]:
-        indeg = {i:0 for i in range(len(self.parsed))}
-        for node, deps in self.graph.items():
-            indeg[node] += len(deps)
-        ready = [i for i,d in indeg.items() if d==0]
+        # Kahn's algorithm: decrement successor indegrees directly instead
+        # of scanning and mutating every node's dependency set per step.
+        indeg = dict(self.indeg)
+        # heap keyed by (priority, original index) replaces re-sorting the
+        # whole ready list on every iteration
+        ready = [(PRIORITY.get(self.parsed[i]["type"], 99), i)
+                 for i,d in indeg.items() if d==0]
+        heapq.heapify(ready)
         order = []
         while ready:
-            # sort by priority then original index
-            ready.sort(key=lambda x: (PRIORITY.get(self.parsed[x]["type"], 99), x))
-            n = ready.pop(0)
+            _, n = heapq.heappop(ready)
             order.append(n)
-            for nxt in range(len(self.parsed)):
-                if n in self.graph[nxt]:
-                    indeg[nxt] -= 1
-                    self.graph[nxt].remove(n)
-                    if indeg[nxt]==0:
-                        ready.append(nxt)
+            for nxt in self.successors[n]:
+                indeg[nxt] -= 1
+                if indeg[nxt]==0:
+                    heapq.heappush(ready, (PRIORITY.get(self.parsed[nxt]["type"], 99), nxt))
         if len(order)!=len(self.parsed):
             raise ValueError("Circular dependency detected")
         return order
@@ -191,11 +224,26 @@ class BehavioralCompiler:
 
     def compile(self) -> str:
         self.parse()
+        # fast path: nothing to order with zero or one instruction
+        if not self.parsed:
+            return ""
+        if len(self.parsed) == 1:
+            return self.generate_directive(self.parsed[0])
         self.build_dependency_graph()
         order = self.topological_sort()
         directives = [self.generate_directive(self.parsed[i]) for i in order]
         return "\n\n".join(directives)
 
+    @classmethod
+    def compile_cached(cls, raw_text: str) -> str:
+        return _compile_cached(raw_text)
+
+# Compilation is deterministic per input, so repeated calls (server/CLI use)
+# can be served from a small LRU cache instead of re-parsing and re-sorting.
+@functools.lru_cache(maxsize=256)
+def _compile_cached(raw_text: str) -> str:
+    return BehavioralCompiler(raw_text).compile()
+
 # ---------------------------------------------------------------------------
 SELF_DESCRIPTION = {
     "Name": "BehavioralInstructionCompiler",
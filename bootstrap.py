@@ -13,11 +13,14 @@ Usage:
 
 import argparse
 import atexit
+import functools
 import json
 import re
 import signal
+import socket
 import subprocess
 import sys
+import threading
 import time
 from datetime import datetime
 from pathlib import Path
@@ -25,6 +28,13 @@ from pathlib import Path
 VERSION = "1.0.0"
 CLI_SERVER_PORT = 9999
 
+# Formats the model may choose in stage 1 ("json" is the default)
+KNOWN_FORMATS = ("json", "xml", "yaml", "s-expression", "pseudocode")
+
+# Terms the stage 4 text-based validation requires in the compiled compiler
+REQUIRED_TERMS = ("Doc2JSONCompiler", "classificationRules", "extractionRules", "outputSchema")
+_REQUIRED_TERMS_RX = re.compile("|".join(map(re.escape, REQUIRED_TERMS)))
+
 # Prompt files (relative to script location)
 PROMPTS_DIR = Path(__file__).parent / "prompts"
 
@@ -38,13 +48,19 @@ server_process = None
 build_dir = None
 
 
+@functools.lru_cache(maxsize=32)
+def _load_text(path):
+    """Read a file once and cache it; prompts and templates are static."""
+    with open(path) as f:
+        return f.read()
+
+
 def load_prompt(name):
     """Load a prompt from the prompts directory."""
     prompt_file = PROMPTS_DIR / f"{name}.txt"
     if not prompt_file.exists():
         raise BootstrapError(f"Prompt file not found: {prompt_file}")
-    with open(prompt_file) as f:
-        return f.read()
+    return _load_text(prompt_file)
 
 
 class BootstrapError(Exception):
@@ -79,11 +95,19 @@ def start_server(args):
         stderr=subprocess.DEVNULL
     )
 
-    # Give server time to start
-    time.sleep(2)
-
-    if server_process.poll() is not None:
-        raise BootstrapError("Failed to start shepherd CLI server")
+    # Poll the CLI port until the server accepts connections instead of
+    # sleeping a fixed 2 seconds; most starts are much faster than that
+    deadline = time.monotonic() + 5
+    while True:
+        if server_process.poll() is not None:
+            raise BootstrapError("Failed to start shepherd CLI server")
+        try:
+            with socket.create_connection(("localhost", CLI_SERVER_PORT), timeout=0.1):
+                break
+        except OSError:
+            if time.monotonic() >= deadline:
+                raise BootstrapError("Shepherd CLI server did not come up")
+            time.sleep(0.05)
 
     log("Server started")
 
@@ -96,7 +120,8 @@ def stop_server():
         log("Stopping shepherd CLI server...")
         subprocess.run(
             ["shepherd", "ctl", "shutdown", str(CLI_SERVER_PORT)],
-            capture_output=True
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
         )
         server_process = None
         log("Server stopped")
@@ -104,15 +129,28 @@ def stop_server():
 
 def clear_context():
     """Clear the shepherd context."""
-    cmd = f"echo '/clear' | shepherd --backend cli --api-base localhost:{CLI_SERVER_PORT}"
-    subprocess.run(cmd, shell=True, capture_output=True)
+    # Feed the command over stdin directly rather than forking a shell
+    # and an echo just to build a pipe.
+    subprocess.run(
+        ["shepherd", "--backend", "cli", "--api-base", f"localhost:{CLI_SERVER_PORT}"],
+        input="/clear\n",
+        text=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
     log("Context cleared")
 
 
+# Compiled once at import; strip_ansi runs on every shepherd response.
+_ANSI_RX = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+_ANSI_RX_BYTES = re.compile(rb'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+
+
 def strip_ansi(text):
-    """Remove ANSI escape codes from text."""
-    ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-    return ansi_escape.sub('', text)
+    """Remove ANSI escape codes from text (str or raw subprocess bytes)."""
+    if isinstance(text, bytes):
+        return _ANSI_RX_BYTES.sub(b'', text).decode('utf-8', 'replace')
+    return _ANSI_RX.sub('', text)
 
 
 def extract_last_response(text):
@@ -126,26 +164,25 @@ def extract_last_response(text):
 
     We want just the last response.
     """
-    # Split on '> ' which marks user prompts
-    parts = re.split(r'\n> |\A> ', text)
-    if len(parts) > 1:
-        # Last part is the last prompt+response, get just the response
-        last_exchange = parts[-1]
-        # Response starts after the first newline (prompt is first line)
-        lines = last_exchange.split('\n', 1)
-        if len(lines) > 1:
-            return lines[1].strip()
+    # Scan backward for the last '> ' prompt marker instead of splitting
+    # the whole history into one string per exchange
+    idx = text.rfind('\n> ')
+    if idx >= 0:
+        last_exchange = text[idx + 3:]
+    elif text.startswith('> '):
+        last_exchange = text[2:]
+    else:
+        return text
+    # Response starts after the first newline (prompt is first line)
+    _, sep, response = last_exchange.partition('\n')
+    if sep:
+        return response.strip()
     return text
 
 
 def call_shepherd(prompt_file):
     """Send prompt to shepherd CLI server and return response."""
-
-    # Read prompt from file
-    with open(prompt_file) as f:
-        prompt_text = f.read()
-
-    return call_shepherd_text(prompt_text)
+    return call_shepherd_text(_load_text(prompt_file))
 
 
 def call_shepherd_text(prompt_text):
@@ -161,47 +198,88 @@ def call_shepherd_text(prompt_text):
     ]
 
     log("Sending prompt...")
-    try:
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=300
-        )
 
-        if result.returncode != 0:
-            raise BootstrapError(f"Shepherd failed: {result.stderr}")
+    # Stream output instead of buffering the full transcript: shepherd
+    # returns the whole conversation history, but we only need the lines
+    # since the last '> ' prompt marker. stderr is merged into stdout so a
+    # chatty process can't deadlock the pipe.
+    proc = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        bufsize=1
+    )
+
+    # The read loop blocks on the child's stdout, so the 300s deadline is
+    # enforced by a watchdog that kills the process; the loop then hits EOF
+    # and we raise the timeout error below.
+    timed_out = threading.Event()
 
-        output = strip_ansi(result.stdout.strip())
+    def _kill_on_timeout():
+        timed_out.set()
+        proc.kill()
 
-        # Append raw output to log file
-        if build_dir:
-            with open(build_dir / "bootstrap.log", "a") as f:
-                f.write(output + "\n\n")
+    watchdog = threading.Timer(300, _kill_on_timeout)
+    watchdog.start()
 
-        response = extract_last_response(output)
-        return response
+    log_file = open(build_dir / "bootstrap.log", "a") if build_dir else None
+    tail = []
+    try:
+        for line in proc.stdout:
+            line = strip_ansi(line.rstrip('\n'))
+            if log_file:
+                log_file.write(line + "\n")
+            if line.startswith('> '):
+                tail = [line]
+            else:
+                tail.append(line)
+        proc.wait()
+    finally:
+        watchdog.cancel()
+        if log_file:
+            log_file.write("\n")
+            log_file.close()
 
-    except subprocess.TimeoutExpired:
+    if timed_out.is_set():
         raise BootstrapError("Shepherd call timed out")
 
+    output = "\n".join(tail).strip()
+    if proc.returncode != 0:
+        raise BootstrapError(f"Shepherd failed: {output}")
+
+    response = extract_last_response(output)
+    return response
+
+
+# One pass over the response: either the body of a markdown fence or a bare
+# JSON object, instead of two fence-stripping substitutions plus a search.
+_FENCE_OR_OBJ = re.compile(r'```(?:json)?\s*\n?([\s\S]*?)\n?```|(\{[\s\S]*\})')
+_OBJ_RX = re.compile(r'\{[\s\S]*\}')
+
 
 def extract_json(text):
     """Extract JSON from response text, handling markdown fences."""
-    # Remove markdown code fences if present
-    text = re.sub(r'^```(?:json)?\s*\n?', '', text, flags=re.MULTILINE)
-    text = re.sub(r'\n?```\s*$', '', text, flags=re.MULTILINE)
-    text = text.strip()
-
-    # Try to find JSON object
-    match = re.search(r'\{[\s\S]*\}', text)
+    match = _FENCE_OR_OBJ.search(text)
     if match:
+        # group(1) may be an empty fence body; only fall back to the bare
+        # object group when the fence branch didn't match at all
+        candidate = match.group(1) if match.group(1) is not None else match.group(2)
         try:
-            return json.loads(match.group())
+            return json.loads(candidate)
         except json.JSONDecodeError:
             pass
 
+        # the fence may wrap prose around the object; recover the braces
+        obj = _OBJ_RX.search(candidate)
+        if obj:
+            try:
+                return json.loads(obj.group())
+            except json.JSONDecodeError:
+                pass
+
     # Try direct parse
+    text = text.strip()
     try:
         return json.loads(text)
     except json.JSONDecodeError as e:
@@ -210,30 +288,31 @@ def extract_json(text):
 
 def extract_between_markers(text, begin_marker, end_marker):
     """Extract content between begin and end markers."""
-    pattern = re.escape(begin_marker) + r'\s*([\s\S]*?)\s*' + re.escape(end_marker)
-    match = re.search(pattern, text)
-    if match:
-        return match.group(1).strip()
-    raise BootstrapError(f"Could not find content between {begin_marker} and {end_marker}")
-
-
-def save_checkpoint(stage, data, build_dir):
+    # Markers are fixed literals, so plain str.find beats building and
+    # running a regex for every stage.
+    start = text.find(begin_marker)
+    if start < 0:
+        raise BootstrapError(f"Could not find content between {begin_marker} and {end_marker}")
+    start += len(begin_marker)
+    end = text.find(end_marker, start)
+    if end < 0:
+        raise BootstrapError(f"Could not find content between {begin_marker} and {end_marker}")
+    return text[start:end].strip()
+
+
+def save_checkpoint(stage, data, args):
     """Save checkpoint for resume capability."""
-    checkpoint_file = build_dir / ".checkpoint.json"
-
-    checkpoint = {}
-    if checkpoint_file.exists():
-        with open(checkpoint_file) as f:
-            checkpoint = json.load(f)
-
-    checkpoint[f"stage{stage}"] = {
+    # The checkpoint dict lives on args for the whole run, so each stage
+    # just updates it and rewrites the file — no re-read and re-parse of
+    # everything saved so far. Compact separators keep the file small.
+    args.checkpoint[f"stage{stage}"] = {
         "completed": True,
         "timestamp": datetime.now().isoformat(),
         "data": data
     }
 
-    with open(checkpoint_file, "w") as f:
-        json.dump(checkpoint, f, indent=2)
+    with open(args.build_dir / ".checkpoint.json", "w") as f:
+        json.dump(args.checkpoint, f, separators=(',', ':'))
 
     log(f"Checkpoint saved for stage {stage}")
 
@@ -262,14 +341,10 @@ def stage1_format_preference(args, checkpoint):
 
     log(f"Model response:\n{response}")
 
-    # Extract format preference from first line
-    first_line = response.split('\n')[0].strip().lower()
-    format_pref = "json"  # default
-
-    for fmt in ["json", "xml", "yaml", "s-expression", "pseudocode"]:
-        if fmt in first_line:
-            format_pref = fmt
-            break
+    # Extract format preference from first line; partition avoids splitting
+    # the whole (possibly long) response into a line list
+    first_line = response.partition('\n')[0].strip().lower()
+    format_pref = next((fmt for fmt in KNOWN_FORMATS if fmt in first_line), "json")
 
     log(f"Detected format preference: {format_pref}")
 
@@ -278,7 +353,7 @@ def stage1_format_preference(args, checkpoint):
         "reasoning": response
     }
 
-    save_checkpoint(1, result, args.build_dir)
+    save_checkpoint(1, result, args)
     return result
 
 
@@ -311,7 +386,7 @@ def stage2_compiler_rules(args, checkpoint):
         "spec_file": str(spec_file)
     }
 
-    save_checkpoint(2, result, args.build_dir)
+    save_checkpoint(2, result, args)
     return result
 
 
@@ -344,7 +419,7 @@ def stage3_self_compile(args, checkpoint, stage2_result, format_pref):
         "format": format_pref
     }
 
-    save_checkpoint(3, result, args.build_dir)
+    save_checkpoint(3, result, args)
     return result
 
 
@@ -371,9 +446,11 @@ def stage4_validate(args, stage3_result):
             raise BootstrapError("Validation failed")
         log("Validation passed (JSON structure)")
     else:
-        # For other formats, do text-based validation
-        required_terms = ["Doc2JSONCompiler", "classificationRules", "extractionRules", "outputSchema"]
-        missing = [term for term in required_terms if term not in compiler]
+        # For other formats, do text-based validation: one alternation pass
+        # records every required term seen instead of a full substring
+        # search per term
+        seen = set(_REQUIRED_TERMS_RX.findall(compiler))
+        missing = [term for term in REQUIRED_TERMS if term not in seen]
         if missing:
             for term in missing:
                 log(f"Missing required term: {term}", "ERROR")
@@ -399,8 +476,7 @@ def stage5_build_bios(args, stage3_result, checkpoint):
     # Load the prompt and template
     prompt_base = load_prompt("stage5-build-bios")
     template_path = args.template if args.template else DEFAULT_TEMPLATE
-    with open(template_path) as f:
-        template_content = f.read()
+    template_content = _load_text(template_path)
 
     # Build full prompt: base + template + markers instruction
     full_prompt = (
@@ -430,7 +506,7 @@ def stage5_build_bios(args, stage3_result, checkpoint):
         "bios_file": str(bios_file)
     }
 
-    save_checkpoint(5, result, args.build_dir)
+    save_checkpoint(5, result, args)
     return result
 
 
@@ -480,12 +556,13 @@ def main():
     atexit.register(stop_server)
     signal.signal(signal.SIGTERM, lambda s, f: sys.exit(0))
 
-    # Load checkpoint if resuming
-    checkpoint = {}
+    # Load checkpoint once; save_checkpoint updates this dict in place
+    args.checkpoint = {}
     if args.resume:
-        checkpoint = load_checkpoint(args.build_dir)
-        if checkpoint:
-            log(f"Resuming from checkpoint with {len(checkpoint)} completed stages")
+        args.checkpoint = load_checkpoint(args.build_dir)
+        if args.checkpoint:
+            log(f"Resuming from checkpoint with {len(args.checkpoint)} completed stages")
+    checkpoint = args.checkpoint
 
     try:
         # Start server